@@ -1,9 +1,55 @@
 from pathlib import Path
+import logging
 import requests
-import base64
+from typing import Callable, TypeVar
 import viktor as vkt  # type: ignore
 import aps_helpers
 
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+# The viewer page is static: read it once and turn its placeholders into format fields.
+_VIEWABLE_VIEWER_TEMPLATE = (
+    (Path(__file__).parent / "ViewableViewer.html").read_text()
+    .replace("{", "{{")
+    .replace("}", "}}")
+    .replace("APS_TOKEN_PLACEHOLDER", "{token}")
+    .replace("URN_PLACEHOLDER", "{urn}")
+    .replace("VIEW_GUID_PLACEHOLDER", "{guid}")
+)
+
+# Concurrent option callbacks for the same hub or file share one fetch.
+_IN_FLIGHT = aps_helpers.SingleFlight()
+
+
+def _get_token() -> str:
+    """
+    Return the current user's APS access token.
+    Not cached in-process: one app instance serves many users and the
+    integration returns the token of the user behind the current job.
+    """
+    integration = vkt.external.OAuth2Integration("aps-integration-viktor")
+    return integration.get_access_token()
+
+
+def _with_token(func: Callable[..., T], *args) -> T:
+    """
+    Call func(token, *args). On a 401 from APS, retry once, but only if the
+    integration now hands out a different token; the same token would fail again.
+    """
+    token = _get_token()
+    try:
+        return func(token, *args)
+    except requests.exceptions.HTTPError as e:
+        if e.response is None or e.response.status_code != 401:
+            raise
+        fresh_token = _get_token()
+        if fresh_token == token:
+            raise
+    return func(fresh_token, *args)
+
 
 class APSView(vkt.WebView):
     pass
@@ -17,80 +63,75 @@ def get_view_options(params, **kwargs):
     if not params.viewable_file:
         return ["Select a viewable file first"]
         
-    viewable_dict = get_viewable_files_dict(params, **kwargs)
+    try:
+        viewable_dict = get_viewable_files_dict(params, **kwargs)
+    except (requests.exceptions.RequestException, ValueError) as e:
+        logger.warning("Error listing viewable files: %s", e)
+        return [vkt.OptionListElement(label="Error listing files in the hub", value=None)]
     urn = viewable_dict.get(params.viewable_file, {}).get("urn")
     if not urn:
         return ["Could not find URN for the selected file"]
 
-    integration = vkt.external.OAuth2Integration("aps-integration-viktor")
-    token = integration.get_access_token()
-    
-    encoded_urn = base64.urlsafe_b64encode(urn.encode()).decode().rstrip("=")
-    url = f"https://developer.api.autodesk.com/modelderivative/v2/designdata/{encoded_urn}/manifest"
-    headers = {"Authorization": f"Bearer {token}"}
-    
+    encoded_urn = aps_helpers.encode_urn(urn)
     try:
-        resp = requests.get(url, headers=headers)
-        resp.raise_for_status()
-        manifest = resp.json()
-    except requests.exceptions.RequestException as e:
-        print(f"Error fetching manifest: {e}")
+        views = _with_token(_manifest_views, encoded_urn)
+    except (requests.exceptions.RequestException, ValueError) as e:  # ValueError: undecodable body (orjson)
+        logger.warning("Error fetching manifest: %s", e)
         return [vkt.OptionListElement(label="Error fetching manifest", value=None)]
 
-    options = []
-    # Find the main derivative with viewable geometry
-    for derivative in manifest.get("derivatives", []):
-        if derivative.get("outputType") in ["svf", "svf2"]:
-            # Find the parent geometry nodes for both 3D and 2D
-            for geometry_node in derivative.get("children", []):
-                
-                if geometry_node.get("type") == "geometry" and geometry_node.get("role") in ["3d", "2d"]:
-                    view_name = geometry_node.get("name")
-                    view_guid = None
-                    view_role = geometry_node.get("role") # '3d' or '2d'
-
-                    # Search its children for the actual node with "type": "view"
-                    for child_node in geometry_node.get("children", []):
-                        if child_node.get("type") == "view":
-                            view_guid = child_node.get("guid")
-                            if child_node.get("name").startswith("Sheet:"):
-                                view_name = child_node.get("name")
-                            break # Found the correct view node
-                    
-                    if view_name and view_guid:
-                        # I added this prefix but can be ommited
-                        label_prefix = "[3D]" if view_role == "3d" else "[2D]"
-                        options.append(vkt.OptionListElement(label=f"{label_prefix} {view_name}", value=view_guid))
-
+    options = [vkt.OptionListElement(label=label, value=view_guid) for label, view_guid in views]
     if not options:
         return [vkt.OptionListElement(label="No 3D or 2D views found in manifest", value=None)]
     
     
     return options
 
-@vkt.memoize
+
+def _manifest_views(token, encoded_urn) -> list[tuple[str, str]]:
+    return _IN_FLIGHT.do(
+        ("views", aps_helpers.token_key(token), encoded_urn),
+        aps_helpers.get_manifest_views,
+        token,
+        encoded_urn,
+    )
+
 def get_viewable_files_dict(params, **kwargs) -> dict[str, dict[str, str]]:
     """ Return a dictionary with keys -> file name, and vals as a dict of file name and urn"""
-    integration = vkt.external.OAuth2Integration("aps-integration-viktor")
-    token = integration.get_access_token()
     if not params.hubs:
         # Return an empty dict to avoid NoneType issues upstream
         return {}
-    hub_id = aps_helpers.get_hub_id_by_name(token, params.hubs)
-    viewable_dict = aps_helpers.get_all_cad_file_from_hub(token=token, hub_id=hub_id) or {}
-    return viewable_dict
+    return _with_token(_viewable_files_for_hub, params.hubs)
+
+
+def _viewable_files_for_hub(token, hub_name) -> dict[str, dict[str, str]]:
+    hub_id = aps_helpers.get_hub_id_by_name(token, hub_name)
+    if hub_id is None:
+        return {}  # unknown hub: never fall through to walking every hub
+    return _IN_FLIGHT.do(("hub", aps_helpers.token_key(token), hub_id), _walk_hub_cached, token, hub_id)
+
+
+@aps_helpers.ttl_cache(ttl=600, maxsize=32)
+def _walk_hub_cached(token, hub_id) -> dict[str, dict[str, str]]:
+    """
+    Hub walk cached on (token digest, hub_id) only, so changing the file or view
+    selection does not trigger a re-crawl. Lists refresh every 10 minutes.
+    A failed walk raises and is therefore never cached.
+    """
+    return aps_helpers.get_all_cad_file_from_hub(token=token, hub_id=hub_id) or {}
 
 def get_hub_list(params, **kwargs) -> list[str]:
-    integration = vkt.external.OAuth2Integration("aps-integration-viktor")
-    token = integration.get_access_token()
-    hub_names = aps_helpers.get_hub_names(token)
+    hub_names = _with_token(aps_helpers.get_hub_names)
     return hub_names if hub_names else ["No hubs found"]
 
 def get_viewable_files_names(params, **kwargs) -> list[str]:
     if not params.hubs:
         return ["Select a hub first!"]
-    print(params.hubs)
-    viewable_file_dict = get_viewable_files_dict(params, **kwargs)
+    logger.debug("Selected hub: %s", params.hubs)
+    try:
+        viewable_file_dict = get_viewable_files_dict(params, **kwargs)
+    except (requests.exceptions.RequestException, ValueError) as e:  # ValueError: unexpected listing payload
+        logger.warning("Error listing viewable files: %s", e)
+        return ["Error listing files in the hub"]
     if viewable_file_dict:
         return list(viewable_file_dict.keys())
     return ["No viewable files in the hub"]
@@ -110,18 +151,22 @@ class Controller(vkt.Controller):
     def viewer_page(self, params, **kwargs):
         """WebView that loads the APS Viewer with the selected view GUID."""
         selected_guid = params.select_view
-        print(selected_guid)
-        integration = vkt.external.OAuth2Integration("aps-integration-viktor")
-        token = integration.get_access_token()
+        logger.debug("Selected view GUID: %s", selected_guid)
+        token = _get_token()
         viewable_file = params.viewable_file
-        viewable_dict = get_viewable_files_dict(params, **kwargs)
+        try:
+            viewable_dict = get_viewable_files_dict(params, **kwargs)
+        except (requests.exceptions.RequestException, ValueError) as e:
+            logger.warning("Error listing viewable files: %s", e)
+            return vkt.WebResult(html="<p>Could not list the files in the hub. Please try again later.</p>")
         urn = viewable_dict.get(viewable_file, {}).get("urn")
+        if not urn:
+            return vkt.WebResult(html="<p>Select a hub and a viewable file first.</p>")
 
-        encoded_urn = base64.urlsafe_b64encode(urn.encode()).decode().rstrip("=")
+        encoded_urn = aps_helpers.encode_urn(urn)
 
-        html = (Path(__file__).parent / "ViewableViewer.html").read_text()
-        html = html.replace("APS_TOKEN_PLACEHOLDER", token)
-        html = html.replace("URN_PLACEHOLDER", encoded_urn) # Pass the ENCODED urn
-        html = html.replace("VIEW_GUID_PLACEHOLDER", selected_guid or "")
+        html = _VIEWABLE_VIEWER_TEMPLATE.format_map(
+            {"token": token, "urn": encoded_urn, "guid": selected_guid or ""}  # Pass the ENCODED urn
+        )
         
         return vkt.WebResult(html=html)
\ No newline at end of file
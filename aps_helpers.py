@@ -1,5 +1,16 @@
+import base64
+import functools
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+import orjson
 import requests
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Hashable, Iterable, NamedTuple, TypeVar
 import urllib.parse
 from models.hubs import HubsList
 from models.projects import ProjectsList
@@ -7,51 +18,321 @@ from models.folders import FoldersList
 from models.contents import FolderContentsList
 
 
+logger = logging.getLogger(__name__)
+
 APS_BASE_URL = "https://developer.api.autodesk.com"
 
+T = TypeVar("T")
+
+# CAD formats the viewer can display; a tuple so str.endswith checks them in one call
+_SUPPORTED_EXTS = (".rvt", ".dwg", ".ifc", ".step", ".stp", ".iam", ".ipt")
+
+# Manifest derivatives that carry viewable geometry
+_VIEWABLE_OUTPUT_TYPES = frozenset({"svf", "svf2"})
+
+# One pooled session for the whole process: keep-alive avoids a TCP+TLS
+# handshake per request. The token is passed per request, never stored on
+# the session, so concurrent callers with different tokens can share it.
+_SESSION = requests.Session()
+_SESSION.mount(
+    "https://",
+    HTTPAdapter(
+        pool_connections=32,
+        pool_maxsize=64,
+        max_retries=Retry(total=3, backoff_factor=0.2, status_forcelist=[429, 500, 502, 503, 504]),
+    ),
+)
+
+
+def _authed_get(url: str, token: str, **kwargs) -> requests.Response:
+    """GET an APS endpoint through the shared session with a bearer token."""
+    headers = {"Authorization": f"Bearer {token}", **kwargs.pop("headers", {})}
+    return _SESSION.get(url, headers=headers, **kwargs)
+
+
+def _authed_post(url: str, token: str, **kwargs) -> requests.Response:
+    """POST to an APS endpoint through the shared session with a bearer token."""
+    headers = {"Authorization": f"Bearer {token}", **kwargs.pop("headers", {})}
+    return _SESSION.post(url, headers=headers, **kwargs)
+
+
+def token_key(token: str) -> str:
+    """Short SHA-256 digest of a token, used as cache key so raw credentials are never stored."""
+    return hashlib.sha256(token.encode()).hexdigest()[:16]
+
+
+def ttl_cache(ttl: float, maxsize: int = 16):
+    """
+    Cache a function whose first argument is an APS token for `ttl` seconds.
+    The token is keyed by its token_key digest; at most `maxsize` entries are kept (LRU).
+    """
+    def decorator(func):
+        cache: OrderedDict = OrderedDict()
+        lock = threading.Lock()
+
+        @functools.wraps(func)
+        def wrapper(token, *args):
+            key = (token_key(token), *args)
+            with lock:
+                entry = cache.get(key)
+                if entry is not None and entry[0] > time.monotonic():
+                    cache.move_to_end(key)
+                    return entry[1]
+            value = func(token, *args)
+            with lock:
+                cache[key] = (time.monotonic() + ttl, value)
+                cache.move_to_end(key)
+                while len(cache) > maxsize:
+                    cache.popitem(last=False)
+            return value
+
+        wrapper.cache_clear = cache.clear  # type: ignore[attr-defined]
+        return wrapper
+    return decorator
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls with the same key into one: the first caller runs
+    the function, callers arriving while it is in flight wait for its result.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: dict[Hashable, Future] = {}
+
+    def do(self, key: Hashable, func: Callable[..., T], *args) -> T:
+        with self._lock:
+            future = self._calls.get(key)
+            is_leader = future is None
+            if is_leader:
+                future = self._calls[key] = Future()
+        if not is_leader:
+            return future.result()
+        try:
+            result = func(*args)
+        except BaseException as exc:
+            future.set_exception(exc)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+
+# (token_key, url, parser) -> (ETag, parsed value), filled by _get_revalidated.
+_ETAG_CACHE: dict[tuple[str, str, Callable], tuple[str, Any]] = {}
+_ETAG_CACHE_MAXSIZE = 4096
+_ETAG_LOCK = threading.Lock()
+
+
+def _get_revalidated(url: str, token: str, parse: Callable[[bytes], T]) -> T:
+    """
+    GET with If-None-Match when the URL was fetched before. On 304 the value parsed
+    from the earlier response is returned, skipping the download and the decode.
+    `parse` is part of the cache key, so it must be a module-level function.
+    """
+    key = (token_key(token), url, parse)
+    cached = _ETAG_CACHE.get(key)
+    response = _authed_get(url, token, headers={"If-None-Match": cached[0]} if cached else {})
+    if cached and response.status_code == 304:
+        return cached[1]
+    response.raise_for_status()
+    value = parse(response.content)
+    etag = response.headers.get("ETag")
+    if etag:
+        with _ETAG_LOCK:
+            _ETAG_CACHE.pop(key, None)
+            while len(_ETAG_CACHE) >= _ETAG_CACHE_MAXSIZE:
+                _ETAG_CACHE.pop(next(iter(_ETAG_CACHE)))  # oldest first
+            _ETAG_CACHE[key] = (etag, value)
+    return value
+
+
+def _fetch(url: str, token: str) -> bytes:
+    """GET an APS endpoint and return the raw body; raises on HTTP errors."""
+    response = _authed_get(url, token)
+    response.raise_for_status()
+    return response.content
+
+
+def _paginate(url: str, token: str, decode: Callable[[bytes], tuple[T, str | None]]) -> list[T]:
+    """
+    Fetch every page of a JSON:API listing by following links.next.
+    `decode` turns one page body into (page value, next href); pages are
+    revalidated by ETag through _get_revalidated.
+    """
+    pages: list[T] = []
+    next_url: str | None = url
+    while next_url:
+        page, next_url = _get_revalidated(next_url, token, decode)
+        pages.append(page)
+    return pages
+
+
+def _try(func: Callable[..., T], *args) -> T | None:
+    """Call func(*args) and return None on any failure; for optional work with a fallback."""
+    try:
+        return func(*args)
+    except Exception:
+        logger.debug("%s%r failed", func.__name__, args[:-1], exc_info=True)  # token is always the last arg
+        return None
+
+
+def _skip_denied(func: Callable[..., T], *args) -> T | None:
+    """
+    Call func(*args) and return None when APS denies access (403/404), e.g. folders
+    the user cannot open. Any other error propagates, so a failed walk is never
+    mistaken for an empty one.
+    """
+    return _none_on_status((403, 404), func, *args)
+
+
+def _skip_unsupported(func: Callable[..., T], *args) -> T | None:
+    """
+    Like _skip_denied, but also returns None on 400: the ListItems command is
+    rejected for projects that do not support it (e.g. non-BIM 360). Throttling
+    (429), 5xx and 401 propagate instead of fanning out into per-item requests.
+    """
+    return _none_on_status((400, 403, 404), func, *args)
+
+
+def _none_on_status(statuses: tuple[int, ...], func: Callable[..., T], *args) -> T | None:
+    try:
+        return func(*args)
+    except requests.exceptions.HTTPError as e:
+        if e.response is None or e.response.status_code not in statuses:
+            raise
+        logger.debug("%s%r returned %s", func.__name__, args[:-1], e.response.status_code)  # token is always the last arg
+        return None
+
+class _HubListing(NamedTuple):
+    raw: bytes
+    pairs: list[tuple[str, str]]  # (hub_id, name)
+    index: dict[str, str]  # name -> hub_id, first hub wins on duplicate names
+
+
+@ttl_cache(ttl=300)
+def _hub_listing(token) -> _HubListing:
+    """
+    Hub listing cached per token for 5 minutes; the hub list rarely changes.
+    Names and the name index come from the same cached response, so the
+    dropdown and the hub id lookup can never disagree.
+    """
+    raw = _fetch(f"{APS_BASE_URL}/project/v1/hubs", token)
+    pairs = [(hub["id"], hub["attributes"]["name"]) for hub in orjson.loads(raw).get("data", ())]
+    index: dict[str, str] = {}
+    for hub_id, name in pairs:
+        index.setdefault(name, hub_id)
+    return _HubListing(raw, pairs, index)
+
 def get_hubs(token) -> HubsList:
     """
     Retrieves a list of hubs the user has access to.
     Corresponds to: GET /project/v1/hubs
     """
-    headers = {"Authorization": f"Bearer {token}"}
-    response = requests.get(f"{APS_BASE_URL}/project/v1/hubs", headers=headers)
-    response.raise_for_status()
-    hubs_data = HubsList.model_validate_json(response.text)  # type: ignore[attr-defined]
-    return hubs_data
+    return HubsList.model_validate_json(_hub_listing(token).raw)  # type: ignore[attr-defined]
 
 def get_projects(hub_id, token) -> ProjectsList:
     """
     Retrieves a list of projects within a specific hub.
     Corresponds to: GET /project/v1/hubs/{hub_id}/projects
     """
-    headers = {"Authorization": f"Bearer {token}"}
-    response = requests.get(f"{APS_BASE_URL}/project/v1/hubs/{hub_id}/projects", headers=headers)
-    response.raise_for_status()
-    return ProjectsList.model_validate_json(response.text)  # type: ignore[attr-defined]
+    return ProjectsList.model_validate_json(_fetch(f"{APS_BASE_URL}/project/v1/hubs/{hub_id}/projects", token))  # type: ignore[attr-defined]
 
 def get_top_folders(hub_id, project_id, token) -> FoldersList:
     """
     Retrieves the top-level folders of a project.
     Corresponds to: GET /project/v1/hubs/{hub_id}/projects/{project_id}/topFolders
     """
-    headers = {"Authorization": f"Bearer {token}"}
-    response = requests.get(f"{APS_BASE_URL}/project/v1/hubs/{hub_id}/projects/{project_id}/topFolders", headers=headers)
-    response.raise_for_status()
-    return FoldersList.model_validate_json(response.text)  # type: ignore[attr-defined]
+    return FoldersList.model_validate_json(_fetch(f"{APS_BASE_URL}/project/v1/hubs/{hub_id}/projects/{project_id}/topFolders", token))  # type: ignore[attr-defined]
+
 
+# Largest page size the folder contents endpoint accepts (default is 20)
+_CONTENTS_PAGE_LIMIT = 200
+
+def _folder_contents_url(project_id, folder_id) -> str:
+    encoded_folder_id = urllib.parse.quote(folder_id) # URL-encode the ID
+    return f"{APS_BASE_URL}/data/v1/projects/{project_id}/folders/{encoded_folder_id}/contents?page[limit]={_CONTENTS_PAGE_LIMIT}"
 
 def get_folder_contents(project_id, folder_id, token) -> FolderContentsList:
     """
     Retrieves the contents (files and subfolders) of a specific folder.
+    Follows links.next so folders larger than one page are listed completely;
+    pages are revalidated by ETag, so an unchanged folder is not parsed again.
     Corresponds to: GET /data/v1/projects/{project_id}/folders/{folder_id}/contents
     """
-    headers = {"Authorization": f"Bearer {token}"}
-    encoded_folder_id = urllib.parse.quote(folder_id) # URL-encode the ID
-    url = f"https://developer.api.autodesk.com/data/v1/projects/{project_id}/folders/{encoded_folder_id}/contents"
-    response = requests.get(url, headers=headers)
-    response.raise_for_status()
-    return FolderContentsList.model_validate_json(response.text)  # type: ignore[attr-defined]
+    first_page, *next_pages = _paginate(_folder_contents_url(project_id, folder_id), token, _decode_typed_contents_page)
+    # Cached pages are shared with later 304 replays, so always return a copy
+    if not next_pages:
+        return first_page.model_copy(update={"data": list(first_page.data)})
+    data = [entry for page in (first_page, *next_pages) for entry in page.data]
+    return first_page.model_copy(update={"data": data, "links": first_page.links.model_copy(update={"next": None})})
+
+
+def _decode_typed_contents_page(content: bytes) -> tuple[FolderContentsList, str | None]:
+    page = FolderContentsList.model_validate_json(content)  # type: ignore[attr-defined]
+    return page, (page.links.next or {}).get("href")
+
+# Read-only fast paths: decode with orjson and keep only the fields the
+# hub walk needs, skipping Pydantic model construction. The typed getters
+# above remain for callers that want the full models.
+
+class ContentEntry(NamedTuple):
+    type: str  # 'folders' or 'items'
+    id: str
+    display_name: str
+    hidden: bool
+
+
+def fast_hubs(token) -> list[tuple[str, str]]:
+    """
+    Retrieves (hub_id, name) pairs of the hubs the user has access to.
+    Corresponds to: GET /project/v1/hubs
+    """
+    return _hub_listing(token).pairs
+
+
+def fast_hub_names(token) -> list[str]:
+    """Names of the hubs the user has access to."""
+    return [name for _, name in fast_hubs(token)]
+
+
+def fast_project_ids(hub_id, token) -> list[str]:
+    """
+    Retrieves the (prefixed) ids of the projects within a hub.
+    Corresponds to: GET /project/v1/hubs/{hub_id}/projects
+    """
+    payload = orjson.loads(_fetch(f"{APS_BASE_URL}/project/v1/hubs/{hub_id}/projects", token))
+    return [project["id"] for project in payload.get("data", ())]
+
+
+def fast_folder_contents(project_id, folder_id, token) -> list[ContentEntry]:
+    """
+    Retrieves the contents of a folder as ContentEntry tuples, following
+    pagination and revalidating each page by ETag like get_folder_contents.
+    Corresponds to: GET /data/v1/projects/{project_id}/folders/{folder_id}/contents
+    """
+    pages = _paginate(_folder_contents_url(project_id, folder_id), token, _decode_contents_page)
+    return [entry for page_entries in pages for entry in page_entries]
+
+
+def _decode_contents_page(content: bytes) -> tuple[list[ContentEntry], str | None]:
+    """Entries of one contents page and the href of the next page, if any."""
+    payload = orjson.loads(content)
+    entries = [
+        ContentEntry(
+            entry["type"],
+            entry["id"],
+            entry["attributes"].get("displayName", ""),
+            entry["attributes"].get("hidden", False),
+        )
+        for entry in payload.get("data", ())
+    ]
+    next_link = (payload.get("links") or {}).get("next") or {}
+    return entries, next_link.get("href")
 
 def get_item_versions(project_id, item_id, token):
     """
@@ -60,103 +341,179 @@ def get_item_versions(project_id, item_id, token):
 
     Corresponds to: GET /data/v1/projects/{project_id}/items/{item_id}/versions
     """
-    headers = {"Authorization": f"Bearer {token}"}
     encoded_item_id = urllib.parse.quote(item_id) # URL-encode the ID
     url = f"https://developer.api.autodesk.com/data/v1/projects/{project_id}/items/{encoded_item_id}/versions"
-    response = requests.get(url, headers=headers)
-    response.raise_for_status()
-    return response.json().get("data", [])
+    return orjson.loads(_fetch(url, token)).get("data", [])
+
+
+# The ListItems command accepts at most 50 resources per call.
+_COMMANDS_BATCH_SIZE = 50
+
+def get_tip_versions_batch(project_id, item_ids, token) -> dict[str, str]:
+    """
+    Retrieves the tip (latest) version id of many items, one request per 50 items.
+    Items missing from the response are left out of the result.
+
+    Corresponds to: POST /data/v1/projects/{project_id}/commands (autodesk.core:ListItems)
+    """
+    url = f"{APS_BASE_URL}/data/v1/projects/{project_id}/commands"
+    item_ids = list(item_ids)
+    tips: dict[str, str] = {}
+    for start in range(0, len(item_ids), _COMMANDS_BATCH_SIZE):
+        chunk = item_ids[start:start + _COMMANDS_BATCH_SIZE]
+        payload = {
+            "jsonapi": {"version": "1.0"},
+            "data": {
+                "type": "commands",
+                "attributes": {
+                    "extension": {
+                        "type": "commands:autodesk.core:ListItems",
+                        "version": "1.0.0",
+                        "data": {"includePathInProject": False},
+                    }
+                },
+                "relationships": {
+                    "resources": {"data": [{"type": "items", "id": item_id} for item_id in chunk]}
+                },
+            },
+        }
+        response = _authed_post(url, token, json=payload, headers={"Content-Type": "application/vnd.api+json"})
+        response.raise_for_status()
+        for resource in orjson.loads(response.content).get("included", []):
+            if resource.get("type") != "items":
+                continue
+            tip = (resource.get("relationships") or {}).get("tip", {}).get("data") or {}
+            if tip.get("id"):
+                tips[resource["id"]] = tip["id"]
+    return tips
+
+
+@functools.lru_cache(maxsize=1024)
+def encode_urn(urn: str) -> str:
+    """URL-safe base64 of a version URN without padding, as the Model Derivative API expects."""
+    return base64.urlsafe_b64encode(urn.encode()).decode().rstrip("=")
+
+
+def get_manifest_views(token, encoded_urn) -> list[tuple[str, str]]:
+    """
+    Retrieves the derivative manifest and returns (label, view_guid) pairs for
+    every 3D/2D geometry node. Every call revalidates with If-None-Match, so a
+    finished translation shows up at once while an unchanged manifest (304)
+    is neither downloaded nor parsed again.
+    Corresponds to: GET /modelderivative/v2/designdata/{urn}/manifest
+    """
+    url = f"{APS_BASE_URL}/modelderivative/v2/designdata/{encoded_urn}/manifest"
+    return _get_revalidated(url, token, _decode_manifest_views)
+
+
+# Runs the speculative metadata GETs of get_model_views_and_metadata. Separate
+# from the walk's pool: walk workers wait on these futures, and waiting on
+# tasks queued behind yourself in the same bounded pool can deadlock.
+_METADATA_POOL = ThreadPoolExecutor(max_workers=8, thread_name_prefix="aps-metadata")
+
+
+def get_model_views_and_metadata(version_urn, token, *, executor: ThreadPoolExecutor | None = None) -> dict[str, Any]:
+    """
+    Retrieves the manifest and the metadata of a version in one round-trip:
+    the metadata GET runs on `executor` (default: a shared module pool) while
+    the manifest is fetched inline. The metadata is dropped, never raised,
+    when its request fails or the translation status is not "success".
+    Do not pass an executor whose worker is calling this function.
+    Corresponds to: GET /modelderivative/v2/designdata/{urn}/manifest
+                    GET /modelderivative/v2/designdata/{urn}/metadata
+
+    Returns {"status": ..., "views": [(label, view_guid)], "metadata": [{"name", "role", "guid"}]}
+    """
+    base_url = f"{APS_BASE_URL}/modelderivative/v2/designdata/{encode_urn(version_urn)}"
+    metadata_future = (executor or _METADATA_POOL).submit(_fetch, f"{base_url}/metadata", token)
+    manifest = orjson.loads(_fetch(f"{base_url}/manifest", token))
+    status = manifest.get("status")
+
+    metadata: list[dict[str, Any]] = []
+    if status == "success":
+        try:
+            metadata = orjson.loads(metadata_future.result()).get("data", {}).get("metadata", [])
+        except (requests.exceptions.RequestException, ValueError):
+            logger.debug("Metadata of %s unavailable", version_urn, exc_info=True)
+    return {"status": status, "views": _parse_manifest_views(manifest), "metadata": metadata}
+
+
+def _decode_manifest_views(content: bytes) -> list[tuple[str, str]]:
+    return _parse_manifest_views(orjson.loads(content))
+
+
+def _parse_manifest_views(manifest: dict) -> list[tuple[str, str]]:
+    """(label, view_guid) for each 3D/2D geometry node of the svf/svf2 derivatives."""
+    views: list[tuple[str, str]] = []
+    for derivative in manifest.get("derivatives", ()):
+        if derivative.get("outputType") not in _VIEWABLE_OUTPUT_TYPES:
+            continue
+        for geometry_node in derivative.get("children", ()):
+            view_role = geometry_node.get("role")  # '3d' or '2d'
+            if geometry_node.get("type") != "geometry" or view_role not in ("3d", "2d"):
+                continue
+            # The first child with "type": "view" carries the GUID the viewer loads
+            view_node = next((c for c in geometry_node.get("children", ()) if c.get("type") == "view"), None)
+            if view_node is None or not view_node.get("guid"):
+                continue
+            view_name = view_node.get("name") or ""
+            if not view_name.startswith("Sheet:"):
+                view_name = geometry_node.get("name")
+            if view_name:
+                # I added this prefix but can be ommited
+                label_prefix = "[3D]" if view_role == "3d" else "[2D]"
+                views.append((f"{label_prefix} {view_name}", view_node["guid"]))
+    return views
 
 
 def get_hub_names(token):
     """Return a list of hub names for the given token."""
-    hubs = get_hubs(token)
-    if hubs and hasattr(hubs, "data"):
-        return [hub.attributes.name for hub in hubs.data]
-    return []
+    return fast_hub_names(token)
 
 
 def get_hub_id_by_name(token, hub_name):
     """Return hub ID for a given hub name."""
-    hubs = get_hubs(token)
-    if hubs and hasattr(hubs, "data"):
-        for hub in hubs.data:
-            if getattr(hub.attributes, "name", None) == hub_name:
-                return hub.id
-    return None
+    return _hub_listing(token).index.get(hub_name)
 
 def get_all_cad_file_from_hub(
     token: str,
     hub_id: str | None = None,
     *,
     include_views: bool = False,
-    max_workers: int = 12,
+    max_workers: int = 32,
 ) -> dict[str, dict[str, str]]:
     """
     Walk through the Autodesk APS hub structure and collect viewable CAD files.
 
-    Returns a dict mapping display_name -> {"urn": <latest_version_urn>}
-    Always returns a dict (possibly empty).
-    """
-
-    def process_top_folder(project_id_with_prefix: str, folder_id: str, executor: ThreadPoolExecutor) -> dict[str, dict[str, str]]:
-        """Worker to crawl a top folder (and its subtree)."""
-        return (
-            get_all_cad_from_folder(
-                project_id_with_prefix,
-                folder_id,
-                token,
-                indent="    ",
-                include_views=include_views,
-                executor=executor,
-            )
-            or {}
-        )
-
-    def process_hub(_hub_id: str, executor: ThreadPoolExecutor) -> dict[str, dict[str, str]]:
-        hub_viewables: dict[str, dict[str, str]] = {}
-        projects = get_projects(_hub_id, token)
-        if projects and projects.data:
-            for project in projects.data:
-                project_id_with_prefix = project.id  # already prefixed (e.g., "b.")
-                top_folders = get_top_folders(_hub_id, project_id_with_prefix, token)
-                if top_folders and top_folders.data:
-                    futures = [
-                        executor.submit(process_top_folder, project_id_with_prefix, folder.id, executor)
-                        for folder in top_folders.data
-                    ]
-                    for fut in as_completed(futures):
-                        try:
-                            viewables = fut.result()
-                            if viewables:
-                                hub_viewables.update(viewables)
-                        except Exception:
-                            pass
-        return hub_viewables
-
+    Returns a dict mapping display_name -> {"urn": <latest_version_urn>}.
+    Projects and folders the user cannot access are skipped; any other APS
+    error (401, 429 after retries, 5xx, network) is raised rather than
+    returning a partial result.
+    """
     # Determine which hubs to process
     hub_ids: list[str]
     if hub_id:
         hub_ids = [hub_id]
     else:
-        hubs = get_hubs(token)
-        if not hubs or not hubs.data:
+        hub_ids = [_hub_id for _hub_id, _ in fast_hubs(token)]
+        if not hub_ids:
             return {}
-        hub_ids = [h.id for h in hubs.data]
 
-    # Execute concurrently across hubs and folders
-    all_viewables: dict[str, dict[str, str]] = {}
     with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        hub_futures = {executor.submit(process_hub, _hid, executor): _hid for _hid in hub_ids}
-        for fut in as_completed(hub_futures):
-            try:
-                hub_result = fut.result()
-                if hub_result:
-                    all_viewables.update(hub_result)
-            except Exception:
-                pass
+        # Projects of every hub, then the top folders of every project
+        project_refs: list[tuple[str, str]] = []
+        for _hub_id, project_ids in zip(hub_ids, executor.map(lambda hid: _skip_denied(fast_project_ids, hid, token), hub_ids)):
+            if project_ids:
+                # project ids are already prefixed (e.g., "b.")
+                project_refs.extend((_hub_id, project_id) for project_id in project_ids)
 
-    return all_viewables
+        roots: list[tuple[str, str]] = []
+        top_folder_lists = executor.map(lambda ref: _skip_denied(get_top_folders, ref[0], ref[1], token), project_refs)
+        for (_, project_id), top_folders in zip(project_refs, top_folder_lists):
+            if top_folders and top_folders.data:
+                roots.extend((project_id, folder.id) for folder in top_folders.data)
+
+        return _collect_cad_from_folders(roots, token, include_views=include_views, executor=executor)
 
 
 def get_all_cad_from_folder(
@@ -169,97 +526,111 @@ def get_all_cad_from_folder(
     executor: ThreadPoolExecutor | None = None,
 ):
     """
-    Recursively traverses a folder and its subfolders. If an executor is provided,
-    subfolders and items are processed concurrently; otherwise, processed serially.
+    Traverses a folder and its subfolders. If an executor is provided,
+    folder listings and item versions are fetched concurrently; otherwise, serially.
     """
-    viewable_files: dict[str, dict[str, str]] = {}
+    return _collect_cad_from_folders(
+        [(project_id, folder_id)],
+        token,
+        include_views=include_views,
+        executor=executor,
+    )
 
-    try:
-        contents = get_folder_contents(project_id, folder_id, token)
-    except requests.exceptions.HTTPError:
-        return viewable_files  # silent: return empty on access errors
 
-    if not contents.data:
-        return viewable_files
+def _collect_cad_from_folders(
+    roots: Iterable[tuple[str, str]],
+    token: str,
+    *,
+    include_views: bool = False,
+    executor: ThreadPoolExecutor | None = None,
+) -> dict[str, dict[str, str]]:
+    """
+    Two-pass walk over (project_id, folder_id) roots.
 
-    # Helpers for item and folder processing
-    def process_item(content) -> dict[str, dict[str, str]]:
-        try:
-            display_name = content.attributes.displayName
-            content_id = content.id
-            supported_extensions = [
-                ".rvt",
-                ".dwg",
-                ".ifc",
-                ".step",
-                ".stp",
-                ".iam",
-                ".ipt",
-            ]
-            if not any(display_name.lower().endswith(ext) for ext in supported_extensions):
-                return {}
-            versions = get_item_versions(project_id, content_id, token)
-            if not versions:
-                return {}
-            latest_version = versions[0]
-            version_urn = latest_version["id"]
-
-            if include_views:
-                try:
-                    _ = get_model_views_and_metadata(version_urn, token)
-                except Exception:
-                    pass
-            return {display_name: {"urn": version_urn}}
-        except Exception:
-            return {}
+    1. Listing: with an executor, each subfolder is scheduled as soon as its
+       parent's listing arrives, so a slow folder never holds back the rest
+       of the tree.
+    2. Tip versions of all CAD items are resolved with batched ListItems
+       commands, falling back to the per-item versions endpoint.
 
-    def process_folder(content) -> dict[str, dict[str, str]]:
-        try:
-            return get_all_cad_from_folder(
-                project_id,
-                content.id,
-                token,
-                indent + "  ",
-                include_views=include_views,
-                executor=executor,
-            )
-        except Exception:
-            return {}
+    Workers never wait on other workers, so a bounded executor cannot deadlock.
+    """
+    map_ = executor.map if executor is not None else map
 
-    if executor is None:
-        # Serial path
-        for content in contents.data:
-            try:
-                content_type = content.type  # 'folders' or 'items'
-                if content_type == "folders":
-                    sub_viewables = process_folder(content)
-                    if sub_viewables:
-                        viewable_files.update(sub_viewables)
-                elif content_type == "items":
-                    item_result = process_item(content)
-                    if item_result:
-                        viewable_files.update(item_result)
-            except Exception:
-                continue
-        return viewable_files
+    cad_items: list[tuple[str, ContentEntry]] = []
 
-    # Concurrent path using provided executor
-    futures = []
-    for content in contents.data:
-        try:
+    def expand(project_id: str, contents: list[ContentEntry] | None) -> list[tuple[str, str]]:
+        """Record the CAD items of a listing and return its subfolders."""
+        if not contents:
+            return []  # silent: skip empty folders and access errors
+        subfolders: list[tuple[str, str]] = []
+        for content in contents:
             if content.type == "folders":
-                futures.append(executor.submit(process_folder, content))
-            elif content.type == "items":
-                futures.append(executor.submit(process_item, content))
-        except Exception:
-            continue
+                subfolders.append((project_id, content.id))
+            elif _is_cad_item(content):
+                cad_items.append((project_id, content))
+        return subfolders
+
+    if executor is None:
+        stack = list(roots)
+        while stack:
+            project_id, folder_id = stack.pop()
+            stack.extend(expand(project_id, _skip_denied(fast_folder_contents, project_id, folder_id, token)))
+    else:
+        pending = {
+            executor.submit(_skip_denied, fast_folder_contents, project_id, folder_id, token): project_id
+            for project_id, folder_id in roots
+        }
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                for project_id, folder_id in expand(pending.pop(future), future.result()):
+                    pending[executor.submit(_skip_denied, fast_folder_contents, project_id, folder_id, token)] = project_id
+
+    # Tip versions in ListItems batches of 50 items per project
+    by_project: dict[str, list[str]] = {}
+    for project_id, content in cad_items:
+        by_project.setdefault(project_id, []).append(content.id)
+    chunks = [
+        (project_id, item_ids[start:start + _COMMANDS_BATCH_SIZE])
+        for project_id, item_ids in by_project.items()
+        for start in range(0, len(item_ids), _COMMANDS_BATCH_SIZE)
+    ]
+    tips: dict[str, str] = {}
+    for chunk_tips in map_(lambda chunk: _skip_unsupported(get_tip_versions_batch, chunk[0], chunk[1], token), chunks):
+        if chunk_tips:
+            tips.update(chunk_tips)
+
+    # Per-item fallback for rejected chunks or items the command did not return
+    missing = [(project_id, content.id) for project_id, content in cad_items if content.id not in tips]
+    for (_, item_id), version_urn in zip(missing, map_(lambda ref: _skip_denied(_latest_version_id, ref[0], ref[1], token), missing)):
+        if version_urn:
+            tips[item_id] = version_urn
+
+    viewable_files: dict[str, dict[str, str]] = {}
+    for _, content in cad_items:
+        version_urn = tips.get(content.id)
+        if version_urn:
+            viewable_files[content.display_name] = {"urn": version_urn}
+
+    if include_views:
+        for _ in map_(lambda urn: _try(get_model_views_and_metadata, urn, token), list(tips.values())):
+            pass
+    return viewable_files
+
+
+def _is_cad_item(content: ContentEntry) -> bool:
+    """Visible item with a supported CAD extension; everything else is never queued."""
+    return (
+        content.type == "items"
+        and not content.hidden
+        and content.display_name.lower().endswith(_SUPPORTED_EXTS)
+    )
 
-    for fut in as_completed(futures):
-        try:
-            res = fut.result()
-            if res:
-                viewable_files.update(res)
-        except Exception:
-            continue
 
-    return viewable_files
\ No newline at end of file
+def _latest_version_id(project_id, item_id, token) -> str | None:
+    """Latest version id of a single item, via the per-item versions endpoint."""
+    versions = get_item_versions(project_id, item_id, token)
+    if not versions:
+        return None
+    return versions[0]["id"]
@@ -0,0 +1,328 @@
+import threading
+
+import orjson
+import pytest
+import requests
+
+import aps_helpers
+
+
+def _response(payload=None, status=200, headers=None, url=""):
+    response = requests.Response()
+    response.status_code = status
+    response._content = orjson.dumps(payload) if payload is not None else b""
+    response.headers.update(headers or {})
+    response.url = url
+    return response
+
+
+def _item(item_id, display_name, hidden=False):
+    return {
+        "type": "items",
+        "id": item_id,
+        "attributes": {
+            "displayName": display_name,
+            "createTime": "2024-01-01T00:00:00.000Z",
+            "createUserId": "user",
+            "createUserName": "User",
+            "lastModifiedTime": "2024-01-01T00:00:00.000Z",
+            "lastModifiedUserId": "user",
+            "lastModifiedUserName": "User",
+            "hidden": hidden,
+            "extension": {"type": "items:autodesk.bim360:File", "version": "1.0"},
+        },
+    }
+
+
+@pytest.fixture(autouse=True)
+def _clear_caches():
+    aps_helpers._ETAG_CACHE.clear()
+    yield
+    aps_helpers._ETAG_CACHE.clear()
+
+
+def test_tip_versions_batch_reads_included_tips(monkeypatch):
+    item_ids = [f"urn:item:{i}" for i in range(60)]
+    posted = []
+
+    def fake_post(url, headers=None, json=None, **kwargs):
+        chunk = [resource["id"] for resource in json["data"]["relationships"]["resources"]["data"]]
+        posted.append(chunk)
+        included = [
+            {"type": "items", "id": item_id, "relationships": {"tip": {"data": {"type": "versions", "id": f"{item_id}?version=3"}}}}
+            for item_id in chunk
+        ]
+        included.append({"type": "versions", "id": "urn:version:ignored"})
+        return _response({"data": {"type": "commands"}, "included": included})
+
+    monkeypatch.setattr(aps_helpers._SESSION, "post", fake_post)
+
+    tips = aps_helpers.get_tip_versions_batch("b.project", item_ids, "token")
+
+    assert [len(chunk) for chunk in posted] == [50, 10]
+    assert tips == {item_id: f"{item_id}?version=3" for item_id in item_ids}
+
+
+def test_walk_falls_back_to_item_versions_for_missing_tips(monkeypatch):
+    contents = {
+        "jsonapi": {"version": "1.0"},
+        "links": {"self": {"href": "contents"}},
+        "data": [
+            _item("urn:item:a", "A.rvt"),
+            _item("urn:item:b", "B.dwg"),
+            _item("urn:item:c", "notes.txt"),
+            _item("urn:item:d", "Hidden.rvt", hidden=True),
+        ],
+    }
+
+    def fake_get(url, headers=None, **kwargs):
+        if url.endswith("/versions"):
+            assert "urn%3Aitem%3Ab" in url
+            return _response({"data": [{"id": "urn:item:b?version=2"}, {"id": "urn:item:b?version=1"}]})
+        return _response(contents)
+
+    def fake_post(url, headers=None, json=None, **kwargs):
+        # The command only knows item a
+        tip = {"data": {"type": "versions", "id": "urn:item:a?version=7"}}
+        return _response({"included": [{"type": "items", "id": "urn:item:a", "relationships": {"tip": tip}}]})
+
+    monkeypatch.setattr(aps_helpers._SESSION, "get", fake_get)
+    monkeypatch.setattr(aps_helpers._SESSION, "post", fake_post)
+
+    viewables = aps_helpers.get_all_cad_from_folder("b.project", "urn:folder", "token")
+
+    assert viewables == {
+        "A.rvt": {"urn": "urn:item:a?version=7"},
+        "B.dwg": {"urn": "urn:item:b?version=2"},
+    }
+
+
+def test_parse_manifest_views_picks_view_guids():
+    manifest = {
+        "derivatives": [
+            {
+                "outputType": "svf2",
+                "children": [
+                    {
+                        "type": "geometry",
+                        "role": "3d",
+                        "name": "{3D}",
+                        "children": [
+                            {"type": "resource", "guid": "resource-guid"},
+                            {"type": "view", "guid": "guid-3d", "name": "{3D}"},
+                            {"type": "view", "guid": "second-view"},
+                        ],
+                    },
+                    {
+                        "type": "geometry",
+                        "role": "2d",
+                        "name": "A101",
+                        "children": [{"type": "view", "guid": "guid-2d", "name": "Sheet: A101 - Plan"}],
+                    },
+                    # No view child: not loadable by the viewer
+                    {"type": "geometry", "role": "2d", "name": "Empty", "children": []},
+                    {"type": "geometry", "role": "graphics", "name": "Other", "children": []},
+                ],
+            },
+            {
+                "outputType": "thumbnail",
+                "children": [
+                    {"type": "geometry", "role": "3d", "name": "Thumb", "children": [{"type": "view", "guid": "x"}]}
+                ],
+            },
+        ]
+    }
+
+    assert aps_helpers._parse_manifest_views(manifest) == [
+        ("[3D] {3D}", "guid-3d"),
+        ("[2D] Sheet: A101 - Plan", "guid-2d"),
+    ]
+
+
+def test_parse_manifest_views_handles_missing_derivatives():
+    assert aps_helpers._parse_manifest_views({"status": "inprogress"}) == []
+
+
+def test_single_flight_shares_one_call_between_concurrent_callers():
+    flight = aps_helpers.SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def slow(value):
+        calls.append(value)
+        started.set()
+        release.wait(timeout=5)
+        return value * 2
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flight.do("key", slow, 21)))
+    leader.start()
+    assert started.wait(timeout=5)
+
+    # Count followers as they block on the leader's future
+    future = flight._calls["key"]
+    waiting = threading.Semaphore(0)
+    wait_for_result = future.result
+
+    def counting_result(*args, **kwargs):
+        waiting.release()
+        return wait_for_result(*args, **kwargs)
+
+    future.result = counting_result
+
+    followers = [threading.Thread(target=lambda: results.append(flight.do("key", slow, 21))) for _ in range(3)]
+    for follower in followers:
+        follower.start()
+    for _ in followers:
+        assert waiting.acquire(timeout=5)
+    release.set()
+    for thread in (leader, *followers):
+        thread.join(timeout=5)
+
+    assert calls == [21]
+    assert results == [42, 42, 42, 42]
+    assert flight._calls == {}
+
+
+def test_single_flight_releases_key_after_failure():
+    flight = aps_helpers.SingleFlight()
+
+    def fail():
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        flight.do("key", fail)
+    assert flight.do("key", lambda: "ok") == "ok"
+
+
+def _contents_pages():
+    """Two pages of a folder listing, keyed by the URL suffix that requests them."""
+    return {
+        "contents?page[limit]=200": {
+            "jsonapi": {"version": "1.0"},
+            "links": {"self": {"href": "page-0"}, "next": {"href": "https://next.example/page-1"}},
+            "data": [_item("urn:item:a", "A.rvt")],
+        },
+        "page-1": {
+            "jsonapi": {"version": "1.0"},
+            "links": {"self": {"href": "page-1"}},
+            "data": [_item("urn:item:b", "B.rvt")],
+        },
+    }
+
+
+def test_folder_contents_follows_next_links(monkeypatch):
+    pages = _contents_pages()
+    requested = []
+
+    def fake_get(url, headers=None, **kwargs):
+        requested.append(url)
+        return _response(next(page for suffix, page in pages.items() if url.endswith(suffix)))
+
+    monkeypatch.setattr(aps_helpers._SESSION, "get", fake_get)
+
+    entries = aps_helpers.fast_folder_contents("b.project", "urn:folder", "token")
+    typed = aps_helpers.get_folder_contents("b.project", "urn:folder", "token")
+
+    assert [entry.id for entry in entries] == ["urn:item:a", "urn:item:b"]
+    assert [content.id for content in typed.data] == ["urn:item:a", "urn:item:b"]
+    assert typed.links.next is None
+    assert requested[0].endswith("/folders/urn%3Afolder/contents?page[limit]=200")
+    assert requested[1] == "https://next.example/page-1"
+
+
+def test_folder_contents_replays_unchanged_pages_on_304(monkeypatch):
+    pages = _contents_pages()
+    conditional = []
+
+    def fake_get(url, headers=None, **kwargs):
+        suffix = next(suffix for suffix in pages if url.endswith(suffix))
+        etag = f'"{suffix}"'
+        if headers.get("If-None-Match") == etag:
+            conditional.append(url)
+            return _response(status=304, headers={"ETag": etag})
+        return _response(pages[suffix], headers={"ETag": etag})
+
+    monkeypatch.setattr(aps_helpers._SESSION, "get", fake_get)
+
+    first = aps_helpers.fast_folder_contents("b.project", "urn:folder", "token")
+    second = aps_helpers.fast_folder_contents("b.project", "urn:folder", "token")
+
+    assert second == first
+    assert len(conditional) == 2
+
+
+def test_manifest_views_pick_up_a_finished_translation(monkeypatch):
+    in_progress = {"status": "inprogress", "derivatives": []}
+    finished = {
+        "status": "success",
+        "derivatives": [
+            {
+                "outputType": "svf",
+                "children": [
+                    {"type": "geometry", "role": "3d", "name": "{3D}", "children": [{"type": "view", "guid": "guid-3d"}]}
+                ],
+            }
+        ],
+    }
+    served = [in_progress, finished, finished]
+
+    def fake_get(url, headers=None, **kwargs):
+        manifest = served.pop(0)
+        etag = f'"{manifest["status"]}"'
+        if headers.get("If-None-Match") == etag:
+            return _response(status=304, headers={"ETag": etag})
+        return _response(manifest, headers={"ETag": etag})
+
+    monkeypatch.setattr(aps_helpers._SESSION, "get", fake_get)
+
+    assert aps_helpers.get_manifest_views("token", "encoded-urn") == []
+    assert aps_helpers.get_manifest_views("token", "encoded-urn") == [("[3D] {3D}", "guid-3d")]
+    assert aps_helpers.get_manifest_views("token", "encoded-urn") == [("[3D] {3D}", "guid-3d")]
+    assert served == []
+
+
+@pytest.mark.parametrize("status, falls_back", [(400, True), (404, True), (429, False), (503, False)])
+def test_walk_falls_back_per_item_only_when_listitems_is_unsupported(monkeypatch, status, falls_back):
+    contents = {
+        "jsonapi": {"version": "1.0"},
+        "links": {"self": {"href": "contents"}},
+        "data": [_item("urn:item:a", "A.rvt")],
+    }
+
+    def fake_get(url, headers=None, **kwargs):
+        if url.endswith("/versions"):
+            return _response({"data": [{"id": "urn:item:a?version=1"}]})
+        return _response(contents)
+
+    monkeypatch.setattr(aps_helpers._SESSION, "get", fake_get)
+    monkeypatch.setattr(aps_helpers._SESSION, "post", lambda url, **kwargs: _response({}, status=status, url=url))
+
+    if falls_back:
+        viewables = aps_helpers.get_all_cad_from_folder("b.project", "urn:folder", "token")
+        assert viewables == {"A.rvt": {"urn": "urn:item:a?version=1"}}
+    else:
+        with pytest.raises(requests.exceptions.HTTPError):
+            aps_helpers.get_all_cad_from_folder("b.project", "urn:folder", "token")
+
+
+def test_single_page_folder_contents_do_not_expose_the_cached_page(monkeypatch):
+    page = {
+        "jsonapi": {"version": "1.0"},
+        "links": {"self": {"href": "contents"}},
+        "data": [_item("urn:item:a", "A.rvt")],
+    }
+
+    def fake_get(url, headers=None, **kwargs):
+        if headers.get("If-None-Match") == '"v1"':
+            return _response(status=304, headers={"ETag": '"v1"'})
+        return _response(page, headers={"ETag": '"v1"'})
+
+    monkeypatch.setattr(aps_helpers._SESSION, "get", fake_get)
+
+    first = aps_helpers.get_folder_contents("b.project", "urn:folder", "token")
+    first.data.clear()
+    replayed = aps_helpers.get_folder_contents("b.project", "urn:folder", "token")
+
+    assert [content.id for content in replayed.data] == ["urn:item:a"]